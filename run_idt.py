@@ -1,13 +1,24 @@
+import csv
 import os
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import numpy as np
+from scipy.special import logsumexp
+from threadpoolctl import threadpool_limits
 import cv2
 from sklearn.mixture import GaussianMixture as GMM
-from sklearn.decomposition import PCA
-import pandas as pd
+from sklearn.decomposition import IncrementalPCA
 import re
 
 import densetrack
 
+try:
+    from decord import DECORDError, VideoReader, cpu
+except ImportError:  # decord is optional, OpenCV is used to decode instead
+    VideoReader = None
+
 # Choose which descriptors you would like to run. If all are set to False,
 # raw IDT features will be outputted.
 HOG_FISHER_VECTOR = True
@@ -18,6 +29,14 @@ DATA_DIRECTORY = 'data'  # the directory of the input video files
 TARGET_DIRECTORY = 'features'  # targets will be put in this directory
 
 K = 128  # GMM components for the Fisher Vector
+CHUNK_SIZE = 4096  # descriptors per GMM posterior evaluation
+SAMPLES_PER_VIDEO = 1000  # descriptors per video used to fit the PCA and GMM
+FRAME_BATCH_SIZE = 64  # frames decoded at once when decord is installed
+# Videos processed in parallel. Each worker holds a whole decoded gray video
+# in memory during the first pass and a video's full trajectory array, which
+# can be larger than the video, during the second pass. Lower this for long
+# videos.
+N_WORKERS = os.cpu_count()
 
 
 def read_video(file):
@@ -31,17 +50,71 @@ def read_video(file):
     :rtype: array_like, shape (D, H, W) where D is the number of frames,
             H and W are the resolution.
     """
-    vidcap = cv2.VideoCapture(os.path.join(DATA_DIRECTORY, file))
-
-    video = []
+    path = os.path.join(DATA_DIRECTORY, file)
+    if VideoReader is not None:
+        return read_video_decord(path)
+
+    vidcap = cv2.VideoCapture(path)
+    if not vidcap.isOpened():
+        print(f'Could not open video file: {path}')
+        return np.empty((0, 0, 0), dtype=np.uint8)
+
+    # Some backends report -1 when the frame count is unknown, the buffer
+    # then grows while decoding.
+    n_frames = max(int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+    height = int(vidcap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    width = int(vidcap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    video = np.empty((n_frames, height, width), dtype=np.uint8)
+
+    i = 0
     success, image = vidcap.read()
     while success:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        video.append(gray)
-        success, image = vidcap.read()
+        if i == video.shape[0]:
+            # The frame count of some containers is only an estimate.
+            video = np.concatenate(
+                (video, np.empty((max(i, 1), height, width), dtype=np.uint8)))
+        cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=video[i])
+        i += 1
+        # Decode the next frame into the same color buffer.
+        success, image = vidcap.read(image)
+    vidcap.release()
+
+    return video[:i]
+
+
+def read_video_decord(path):
+    """
+    Reads the frames from a video file with decord, decoding the frames in
+    batches of FRAME_BATCH_SIZE straight into the gray output array.
+
+    :param path: the path of the video file.
+    :type path: String
+
+    :return: the gray video as a numpy array.
+    :rtype: array_like, shape (D, H, W) where D is the number of frames,
+            H and W are the resolution.
+    """
+    # One decoding thread, since the videos are already spread over
+    # N_WORKERS processes.
+    try:
+        reader = VideoReader(path, ctx=cpu(0), num_threads=1)
+    except (DECORDError, RuntimeError):  # decord raises both on bad files
+        reader = []
+    if len(reader) == 0:
+        print(f'Could not open video file: {path}')
+        return np.empty((0, 0, 0), dtype=np.uint8)
+
+    video = None
+    for start in range(0, len(reader), FRAME_BATCH_SIZE):
+        indices = list(range(start, min(start + FRAME_BATCH_SIZE, len(reader))))
+        frames = reader.get_batch(indices).asnumpy()  # decord decodes to RGB
+        if video is None:
+            video = np.empty((len(reader),) + frames.shape[1:3], dtype=np.uint8)
+        for i, frame in zip(indices, frames):
+            cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY, dst=video[i])
+
+    return video
 
-    return np.array(video)
-    
     
 def fisher_vector(xx, gmm):
     """
@@ -51,7 +124,8 @@ def fisher_vector(xx, gmm):
     :type xx: array_like, shape (N, D) where N is the number of descriptors
               and D is the dimension of each descriptor (e.g. 96 for HOG).
 
-    :param gmm: Gauassian mixture model of the descriptors.
+    :param gmm: Gauassian mixture model of the descriptors with diagonal
+                covariances.
     :type gmm: instance of sklearn mixture.GMM object
 
     :return: Fisher vector of the given descriptor.
@@ -63,13 +137,45 @@ def fisher_vector(xx, gmm):
     xx = np.atleast_2d(xx)
     N = xx.shape[0]
 
-    # Compute posterior probabilities.
-    Q = gmm.predict_proba(xx)  # NxK
-
-    # Compute the sufficient statistics of descriptors.
-    Q_sum = np.sum(Q, 0)[:, np.newaxis] / N
-    Q_xx = np.dot(Q.T, xx) / N
-    Q_xx_2 = np.dot(Q.T, xx ** 2) / N
+    K, D = gmm.means_.shape
+
+    # The log posteriors of a diagonal GMM are an affine function of x and
+    # x ** 2, so they are computed with a matrix product per chunk rather
+    # than with gmm.predict_proba. Each chunk is laid out as [1, x, x ** 2],
+    # so one product with the weights [log_norm, mu / sigma, -1 / (2 sigma)]
+    # gives the log posteriors and one product with the posteriors gives all
+    # three sufficient statistics.
+    precisions = 1 / gmm.covariances_  # KxD
+    means_precisions = gmm.means_ * precisions  # KxD
+    log_norm = np.log(gmm.weights_) - 0.5 * (
+        D * np.log(2 * np.pi)
+        + np.sum(np.log(gmm.covariances_), 1)
+        + np.sum(gmm.means_ * means_precisions, 1))  # K
+    # Cast to the dtype of the descriptors, so float32 descriptors keep the
+    # products in single precision.
+    weights = np.hstack((log_norm[:, np.newaxis], means_precisions,
+                         -0.5 * precisions)).astype(xx.dtype)  # Kx(1+2D)
+
+    # Compute the sufficient statistics of descriptors chunk by chunk, so
+    # only a CHUNK_SIZExK block of posterior probabilities is held at once.
+    # They are accumulated in float64 to avoid rounding drift across chunks.
+    statistics = np.zeros((K, 1 + 2 * D))
+    # Reused buffer for the [1, x, x ** 2] layout of a chunk.
+    stacked = np.empty((min(N, CHUNK_SIZE), 1 + 2 * D), dtype=xx.dtype)
+    stacked[:, 0] = 1
+    for start in range(0, N, CHUNK_SIZE):
+        xx_chunk = xx[start:start + CHUNK_SIZE]
+        stacked_chunk = stacked[:xx_chunk.shape[0]]
+        stacked_chunk[:, 1:D + 1] = xx_chunk
+        np.multiply(xx_chunk, xx_chunk, out=stacked_chunk[:, D + 1:])
+        log_Q = np.dot(stacked_chunk, weights.T)  # CHUNK_SIZExK
+        Q = np.exp(log_Q - logsumexp(log_Q, axis=1, keepdims=True))
+        statistics += np.dot(Q.T, stacked_chunk)
+
+    statistics /= N
+    Q_sum = statistics[:, :1]
+    Q_xx = statistics[:, 1:D + 1]
+    Q_xx_2 = statistics[:, D + 1:]
 
     # Compute derivatives with respect to mixing weights, means and variances.
     d_pi = Q_sum.squeeze() - gmm.weights_
@@ -93,11 +199,11 @@ def read_hog(descriptors):
     :type descriptors: array_like, shape (N, ) where N is the number of
                        trajectories. Value of each element is a np.void.
 
-    :return: HOG descriptors.
-    :rtype: array_like, shape (N, ) where N is the number of trajectories.
+    :return: HOG descriptors, a view into the trajectories without a copy.
+    :rtype: array_like, shape (N, D) where N is the number of trajectories
+            and D is the dimension of the descriptor.
     """
-    return np.array([descriptors[i][-5] for i in
-                    range(descriptors.shape[0])])
+    return descriptors['hog']
 
 
 def read_hof(descriptors):
@@ -109,11 +215,11 @@ def read_hof(descriptors):
     :type descriptors: array_like, shape (N, ) where N is the number of
                        trajectories. Value of each element is a np.void.
 
-    :return: HOF descriptors.
-    :rtype: array_like, shape (N, ) where N is the number of trajectories.
+    :return: HOF descriptors, a view into the trajectories without a copy.
+    :rtype: array_like, shape (N, D) where N is the number of trajectories
+            and D is the dimension of the descriptor.
     """
-    return np.array([descriptors[i][-4] for i in
-                     range(descriptors.shape[0])])
+    return descriptors['hof']
 
 
 def read_mbh(descriptors):
@@ -125,86 +231,164 @@ def read_mbh(descriptors):
     :type descriptors: array_like, shape (N, ) where N is the number of
                        trajectories. Value of each element is a np.void.
 
-    :return: MBH descriptors.
-    :rtype: array_like, shape (N, ) where N is the number of trajectories.
+    :return: MBH descriptors, a view into the trajectories without a copy.
+    :rtype: array_like, shape (N, D) where N is the number of trajectories
+            and D is the dimension of the descriptor.
     """
-    mbh_x_descriptors = np.array([descriptors[i][-3] for i in
-                                  range(descriptors.shape[0])])
-    mbh_y_descriptors = np.array([descriptors[i][-2] for i in
-                                  range(descriptors.shape[0])])
+    mbh_x_descriptors = descriptors['mbh_x']
+    mbh_y_descriptors = descriptors['mbh_y']
 
     return mbh_x_descriptors, mbh_y_descriptors
 
 
-def fisher_descriptor(descriptor):
+def read_descriptors(tracks):
     """
-    Compute the fisher vector based on a set of descriptors.
+    Extracts the descriptors selected at the top of the script.
 
-    As described in the original Improved Dense Trajectory papers, the dimension
-    of the descriptors is halved with PCA. The default value of the GMM
-    components, K (defined at the top of the script), is 256.
+    :param tracks: the improved dense trajectories returned by
+                   densetrack.densetrack method.
+    :type tracks: array_like, shape (N, ) where N is the number of
+                  trajectories. Value of each element is a np.void.
+
+    :return: the selected descriptors keyed by 'hog', 'hof', 'mbh_x' and
+             'mbh_y'.
+    :rtype: dict of array_like, shape (N, D)
+    """
+    descriptors = {}
+    if HOG_FISHER_VECTOR:
+        descriptors['hog'] = read_hog(tracks)
+    if HOF_FISHER_VECTOR:
+        descriptors['hof'] = read_hof(tracks)
+    if MBH_FISHER_VECTOR:
+        descriptors['mbh_x'], descriptors['mbh_y'] = read_mbh(tracks)
+    return descriptors
+
+
+def sample_descriptors(descriptor, rng):
+    """
+    Draws at most SAMPLES_PER_VIDEO descriptors without replacement.
 
     :param descriptor: the descriptor (e.g. HOG/HOF/MBH) for each video.
+    :type descriptor: array_like, shape (N, D)
+
+    :param rng: the random generator used for the selection.
+    :type rng: numpy.random.Generator
+
+    :return: the sampled descriptors.
+    :rtype: array_like, shape (min(N, SAMPLES_PER_VIDEO), D)
+    """
+    n_samples = min(descriptor.shape[0], SAMPLES_PER_VIDEO)
+    return descriptor[rng.choice(descriptor.shape[0], n_samples,
+                                 replace=False)]
+
+
+def update_pca(pca, pending, flush=False):
+    """
+    Feeds the pending descriptor samples to an incremental PCA and clears
+    them. The samples are held back until there are at least as many as PCA
+    components, since the first batch of an incremental PCA needs that many.
+
+    :param pca: the PCA shared by all videos for a descriptor.
+    :type pca: instance of sklearn decomposition.IncrementalPCA object
+
+    :param pending: the samples not yet seen by the PCA, cleared once fed.
+    :type pending: list of array_like, shape (N, D)
+
+    :param flush: feed the pending samples regardless of their number.
+    :type flush: bool
+    """
+    if pending and (flush or sum(len(d) for d in pending) >= pca.n_components):
+        pca.partial_fit(np.concatenate(pending))
+        pending.clear()
+
+
+def fit_gmm(descriptor, pca):
+    """
+    Fits the GMM used to compute the fisher vectors of a descriptor.
+
+    As described in the original Improved Dense Trajectory papers, a single
+    GMM with K components (defined at the top of the script) is fit on
+    descriptors sampled from all videos, so that the fisher vectors of
+    different videos are comparable. The GMM is fit in the space of the PCA,
+    which halves the dimension of the descriptors and is fit beforehand with
+    update_pca.
+
+    :param descriptor: the sampled descriptors (e.g. HOG/HOF/MBH) of all videos.
     :type descriptor: array_like, shape (N, D) where N is the number of
                       descriptors and D is the dimension of each descriptor
                       (e.g. 96 for HOG).
 
+    :param pca: the PCA fitted on the sampled descriptors with update_pca.
+    :type pca: instance of sklearn decomposition.IncrementalPCA object
+
+    :return: the fitted GMM.
+    :rtype: instance of sklearn mixture.GaussianMixture object
+    """
+    descriptor = descriptor.astype(np.float32, copy=False)
+    # The EM runs on the small pooled sample only, so it is done in float64
+    # for stable covariances; fisher_vector casts the parameters back to the
+    # dtype of the descriptors.
+    descriptor_pca = pca.transform(descriptor).astype(np.float64)
+    return GMM(n_components=K, covariance_type='diag').fit(descriptor_pca)
+
+
+def encode_fisher(descriptor, pca, gmm):
+    """
+    Compute the fisher vector of a video's descriptors with a fitted model.
+
+    :param descriptor: the descriptor (e.g. HOG/HOF/MBH) for each video.
+    :type descriptor: array_like, shape (N, D) where N is the number of
+                      descriptors and D is the dimension of each descriptor
+                      (e.g. 96 for HOG).
+
+    :param pca: the PCA fitted with update_pca.
+    :type pca: instance of sklearn decomposition.IncrementalPCA object
+
+    :param gmm: the GMM returned by fit_gmm.
+    :type gmm: instance of sklearn mixture.GaussianMixture object
+
     :return: fisher vector of the descriptors.
     :rtype: array_like, shape (K + 2 * K * D/2) since the dimension is halved
             with a PCA.
     """
-    # Ensure descriptor is 2D - reshape if it has more than 2 dimensions
-    if descriptor.ndim > 2:
-        # Get the size of first descriptor to determine feature dimension
-        feature_dim = np.prod(descriptor[0].shape)
-        # Reshape to 2D: (n_samples, feature_dimension)
-        descriptor = np.array([d.flatten() for d in descriptor])
+    descriptor = descriptor.astype(np.float32, copy=False)
+    return fisher_vector(pca.transform(descriptor), gmm)
 
-    descriptor_pca = PCA(n_components=int(descriptor.shape[1]/2))\
-        .fit(descriptor).transform(descriptor)
-    gmm = GMM(n_components=K, covariance_type='diag').fit(descriptor_pca)
-    return fisher_vector(descriptor_pca, gmm)
 
-
-def add_row_to_table(data_frame, name, features):
-    """
-    Adds a row to the data frame.
-    If empty, creates the data frame. Otherwise, add name of the video and
-    corresponding descriptor's features.
+def write_row(path, index, name, features):
     """
-    if data_frame.empty:
-        col_names = ['name'] + [str(i) for i in range(len(features))]
-        dtypes = {'name': 'object'}
-        for i in range(len(features)):
+    Writes the row of a video to a CSV file. The first row (index 0) creates
+    the file with its header, later rows are appended to it.
 
+    :param path: The path of the CSV file of a descriptor (HOG/HOF/MBH).
+    :type path: String
 
-            dtypes[str(i)] = 'float64'
-        data_frame = pd.DataFrame(columns=col_names).astype(dtypes)
-    # Create new row dictionary
-    new_row_data = {'name': name}
-    for i, val in enumerate(features):
-        new_row_data[str(i)] = val
-
-    # Append to the DataFrame
-    data_frame = pd.concat([data_frame, pd.DataFrame([new_row_data], columns=data_frame.columns)], ignore_index=True)
+    :param index: The index of the row.
+    :type index: int
 
-    return data_frame
+    :param name: The name of the video.
+    :type name: String
 
+    :param features: The features of the descriptor for the video.
+    :type features: array_like, shape (M, )
+    """
+    with open(path, 'w' if index == 0 else 'a', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        if index == 0:
+            writer.writerow(['', 'name'] + [str(i) for i in
+                                            range(len(features))])
+        writer.writerow([index, name, *features.tolist()])
 
 
-def save_as_csv(data_frame, path):
-    """
-    Creates a CSV file from a data frame and does nothing if frame is empty.
+_DIGITS = re.compile('([0-9]+)')
 
-    :param data_frame: The final data frame of a descriptor (HOG/HOG/MBH) for
-                       all videos.
-    :type data_frame: DataFrame
 
-    :param path: The path to write the DataFrame to.
-    :type path: String
+def _alphanum_key(key):
     """
-    if not data_frame.empty:
-        data_frame.to_csv(path)
+    Splits a string into its lowercase text and integer parts.
+    """
+    return [int(c) if c.isdigit() else c.lower() for c in _DIGITS.split(key)]
+
 
 def sorted_alphanumeric(data):
     """
@@ -212,61 +396,174 @@ def sorted_alphanumeric(data):
     :param data: data to be sorted e.g. a list
     :return: sorted data alphanumerically e.g. "User_2" before "User_10"
     """
-    convert = lambda text: int(text) if text.isdigit() else text.lower()
-    alphanum_key = lambda key: [ convert(c) for c in re.split('([0-9]+)', key) ]
-    return sorted(data, key=alphanum_key)
+    return sorted(data, key=_alphanum_key)
+
+
+def video_name(file):
+    """
+    Returns the name of a video file without its directory and extension.
+    """
+    return os.path.splitext(os.path.split(file)[1])[0]
+
+
+def trajectory_path(file):
+    """
+    Returns the path the trajectories of a video file are saved to.
+    """
+    return os.path.join(TARGET_DIRECTORY, video_name(file) + '-trajectory.npy')
+
+
+def limit_worker_threads():
+    """
+    Limits BLAS and OpenCV to one thread in a worker process, since the
+    videos are already spread over N_WORKERS processes. decord's decoding
+    threads are limited in read_video_decord.
+    """
+    threadpool_limits(1)
+    cv2.setNumThreads(1)
+
+
+def track_video(file, seed):
+    """
+    Computes the improved dense trajectories of a video, saves them and
+    samples the selected descriptors to fit the PCA and GMM on.
+
+    Trajectories saved by an earlier run are loaded instead of being
+    computed again, so the descriptors or K can be changed without tracking
+    the videos again. Delete the saved file to track a video again.
+
+    :param file: the filename in the data directory.
+    :type file: String
+
+    :param seed: the seed of the random generator used for the sampling.
+    :type seed: int
+
+    :return: the sampled descriptors keyed like read_descriptors.
+    :rtype: dict of array_like, shape (SAMPLES_PER_VIDEO, D)
+    """
+    path = trajectory_path(file)
+    print('------------------------------------------')
+    if os.path.exists(path):
+        print(f'Loading: {path}')
+        tracks = np.load(path)
+    else:
+        video = read_video(file)
+        print(f'Running: {file} of shape {video.shape}')
+
+        tracks = densetrack.densetrack(video, adjust_camera=True)
+        del video
+
+        # save all trajectories and descriptors, these are read again by the
+        # second pass and by later runs. The file is renamed into place so an
+        # interrupted run does not leave a truncated file behind.
+        trajectory_file = tempfile.NamedTemporaryFile(
+            dir=TARGET_DIRECTORY, suffix='.part', delete=False)
+        try:
+            with trajectory_file:
+                np.save(trajectory_file, tracks)
+            os.replace(trajectory_file.name, path)
+        except BaseException:
+            # e.g. a full disk, do not leave the partial file behind
+            os.unlink(trajectory_file.name)
+            raise
+
+    rng = np.random.default_rng(seed)
+    return {key: sample_descriptors(descriptor, rng)
+            for key, descriptor in read_descriptors(tracks).items()}
+
+
+def encode_video(file, models):
+    """
+    Computes the fisher vectors of a video from its saved trajectories.
+
+    :param file: the filename in the data directory.
+    :type file: String
+
+    :param models: the PCA fitted with update_pca and the GMM returned by
+                   fit_gmm of each descriptor, keyed like read_descriptors.
+    :type models: dict of tuple (IncrementalPCA, GMM)
+
+    :return: the fisher vectors keyed like read_descriptors.
+    :rtype: dict of array_like, shape (K + 2 * K * D/2)
+    """
+    tracks = np.load(trajectory_path(file))
+    return {key: encode_fisher(descriptor, *models[key])
+            for key, descriptor in read_descriptors(tracks).items()}
+
 
 def main():
     if not os.listdir(DATA_DIRECTORY):
         print('No input video files are present. Please put your files in the '
               '"data" directory, rebuild the image and run the container.')
     else:
-        hog_df, hof_df, mbh_df = pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-
-        for i, file in enumerate(sorted_alphanumeric(os.listdir(DATA_DIRECTORY))):
-            video = read_video(file)
-            print('------------------------------------------')
-            print(f'Running: {file} of shape {video.shape}')
-
-            tracks = densetrack.densetrack(video, adjust_camera=True)
-            name = os.path.splitext(os.path.split(file)[1])[0]
+        files = sorted_alphanumeric(os.listdir(DATA_DIRECTORY))
+
+        # The saved trajectories and the CSV rows are named by the video name
+        # without its extension, so e.g. clip.mp4 and clip.avi would collide.
+        name_counts = Counter(video_name(file) for file in files)
+        duplicates = [file for file in files
+                      if name_counts[video_name(file)] > 1]
+        if duplicates:
+            print('Video files must have distinct names without their '
+                  f'extensions, please rename: {", ".join(duplicates)}')
+            return
+
+        samples, pending, pcas = {}, {}, {}
+
+        with ProcessPoolExecutor(max_workers=N_WORKERS,
+                                 initializer=limit_worker_threads) as executor:
+            # First pass: compute and save the trajectories of every video
+            # and sample descriptors to fit the PCA and GMM on. The PCA is
+            # updated with the samples of each video as they arrive, while
+            # the workers are tracking the remaining videos.
+            for i, (file, video_samples) in enumerate(zip(
+                    files, executor.map(track_video, files,
+                                        range(len(files))))):
+                for key, descriptor in video_samples.items():
+                    samples.setdefault(key, []).append(descriptor)
+                    pending.setdefault(key, []).append(descriptor)
+                    if key not in pcas:
+                        pcas[key] = IncrementalPCA(
+                            n_components=descriptor.shape[1] // 2)
+                    update_pca(pcas[key], pending[key])
+
+                print(f'Completed {file}')
+                if (i+1) % 10 == 0:
+                    print(f'{i+1} files were completed.')
 
             if not (HOG_FISHER_VECTOR or HOF_FISHER_VECTOR or
                     MBH_FISHER_VECTOR):
-                # save all trajectories and descriptors without processing
-                np.save(os.path.join(TARGET_DIRECTORY, name
-                                     + '-trajectory'), tracks)
-            else:
+                # raw IDT features were requested, there is nothing to encode
+                return
+
+            # Second pass: compute the fisher vectors of every video with
+            # models shared by all videos.
+            for key, pca in pcas.items():
+                update_pca(pca, pending[key], flush=True)
+            models = {key: (pcas[key],
+                            fit_gmm(np.concatenate(descriptors), pcas[key]))
+                      for key, descriptors in samples.items()}
+
+            # The rows are written as soon as a video is encoded, so memory
+            # does not grow with the number of videos. Videos are sent to the
+            # workers in batches, so the models are pickled once per batch
+            # rather than once per video, while keeping about four batches
+            # per worker to balance the load.
+            batch_size = max(1, len(files) // (4 * N_WORKERS))
+            for i, (file, fisher_vectors) in enumerate(zip(
+                    files, executor.map(encode_video, files, repeat(models),
+                                        chunksize=batch_size))):
+                name = video_name(file)
                 if HOG_FISHER_VECTOR:
-                    hog_descriptors = read_hog(tracks)
-                    hog_fv = fisher_descriptor(hog_descriptors)
-                    hog_df = add_row_to_table(hog_df, name, hog_fv)
+                    write_row('features/hog_features.csv', i, name,
+                              fisher_vectors['hog'])
                 if HOF_FISHER_VECTOR:
-                    hof_descriptors = read_hof(tracks)
-                    hof_fv = fisher_descriptor(hof_descriptors)
-                    hof_df = add_row_to_table(hof_df, name, hof_fv)
-
+                    write_row('features/hof_features.csv', i, name,
+                              fisher_vectors['hof'])
                 if MBH_FISHER_VECTOR:
-                    mbh_x_descriptors, mbh_y_descriptors = read_mbh(tracks)
-                    mbh_x_fv = fisher_descriptor(mbh_x_descriptors)
-                    mbh_y_fv = fisher_descriptor(mbh_y_descriptors)
-
-                    mbh_fv = np.concatenate((mbh_x_fv, mbh_y_fv))
-                    mbh_df = add_row_to_table(mbh_df, name, mbh_fv)
-
-                del tracks
-
-            print(f'Completed {file}')
-            if (i+1) % 10 == 0:
-                print(f'{i+1} files were completed.')
-
-    # Save CSV files once after processing all videos
-    if HOG_FISHER_VECTOR:
-        save_as_csv(hog_df, 'features/hog_features.csv')
-    if HOF_FISHER_VECTOR:
-        save_as_csv(hof_df, 'features/hof_features.csv')
-    if MBH_FISHER_VECTOR:
-        save_as_csv(mbh_df, 'features/mbh_features.csv')
+                    mbh_fv = np.concatenate((fisher_vectors['mbh_x'],
+                                             fisher_vectors['mbh_y']))
+                    write_row('features/mbh_features.csv', i, name, mbh_fv)
 
 
 if __name__ == '__main__':